@@ -3,27 +3,37 @@ import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from snowflake.snowpark.context import get_active_session
+from data_backend import get_session
+from rollup import top_k_rollup_sql
+from daily_aggregates import exposure_agg_source
 
-session = get_active_session()
+session = get_session()
 
 @st.cache_data
-def get_allocation_data(portfolio_id):
+def get_allocation_data(portfolio_id, top_k=None):
     """
     Fetch asset allocation and exposure data for a given portfolio.
     Returns a DataFrame with asset_class, sector, region, nav_amt.
+    `top_k` maps a dimension to the number of values to keep; the rest
+    are summed into an "Other" bucket in the warehouse.
     """
     try:
+        rollup = top_k_rollup_sql(
+            "allocation", ["asset_class", "sector", "region"], "nav_amt", top_k
+        )
         query = f"""
-        SELECT
-            d.investment_type AS asset_class,
-            d.fund_focus AS sector,
-            v.account_region_cd AS region,
-            SUM(v.net_asset_value_amt) AS nav_amt
-        FROM contoso_daily_valuation_fact v
-        JOIN portfolio_dim_extra d
-        ON v.portfolio_id = d.portfolio_id
-        GROUP BY asset_class, sector, region
+        WITH allocation AS (
+            SELECT
+                e.asset_class,
+                e.sector,
+                e.region,
+                SUM(e.nav_amt) AS nav_amt
+            FROM {exposure_agg_source()} e
+            WHERE e.portfolio_id = {portfolio_id}
+            GROUP BY e.asset_class, e.sector, e.region
+        )
+        {rollup}
+        ORDER BY nav_amt DESC
         """
         return session.sql(query).to_pandas()
     except Exception as e:
@@ -31,13 +41,13 @@ def get_allocation_data(portfolio_id):
         return pd.DataFrame()
 
 
-def display_allocation(portfolio_id):
+def display_allocation(portfolio_id, top_k=None):
     """
     Display asset allocation breakdown for a portfolio:
     - Pie chart for asset class distribution
-    - Bar chart for drilling down by sector or region
+    - Bar chart for drilling down by sector or region (top K + "Other")
     """
-    df_allocation = get_allocation_data(portfolio_id)
+    df_allocation = get_allocation_data(portfolio_id, top_k)
     st.session_state["df_allocation"] = df_allocation  
 
     if df_allocation.empty:
@@ -3,52 +3,76 @@ import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from snowflake.snowpark.context import get_active_session
+from data_backend import get_session
+from rollup import top_k_rollup_sql
+from daily_aggregates import exposure_agg_source
 
-session = get_active_session()
+session = get_session()
 
 @st.cache_data
-def get_attribution_data(portfolio_id):
-    """Fetch attribution analysis data for a portfolio"""
+def get_attribution_data(portfolio_id, top_k=None):
+    """
+    Fetch attribution analysis data for a portfolio, optionally rolled up to top K per dimension.
+    Highest/worst contribution are computed over the unrolled combinations and
+    returned as extra columns on every row.
+    """
     try:
+        rollup = top_k_rollup_sql(
+            "portfolio_combinations",
+            ["asset_class", "sector", "region", "theme"],
+            "nav_contribution",
+            top_k,
+            partition_by="portfolio_id",
+        )
         query = f"""
-        WITH nav_by_portfolio AS (
-    SELECT
-        portfolio_id,
-        account_region_cd AS region,
-        SUM(net_asset_value_amt) AS nav_amt
-    FROM contoso_daily_valuation_fact
-    GROUP BY portfolio_id, account_region_cd
-),
-combo_count AS (
+        WITH combo_count AS (
     SELECT portfolio_id, COUNT(*) AS num_combos
     FROM portfolio_dim_extra
+    WHERE portfolio_id = {portfolio_id}
     GROUP BY portfolio_id
 ),
 portfolio_combinations AS (
     SELECT
-        d.portfolio_id,
-        d.investment_type AS asset_class,
-        d.fund_focus AS sector,
-        d.investment_theme AS theme,
-        n.region,
-        n.nav_amt / c.num_combos AS nav_contribution
-    FROM portfolio_dim_extra d
-    JOIN nav_by_portfolio n
-      ON d.portfolio_id = n.portfolio_id
+        e.portfolio_id,
+        e.asset_class,
+        e.sector,
+        e.theme,
+        e.region,
+        e.nav_amt / c.num_combos AS nav_contribution
+    FROM {exposure_agg_source()} e
     JOIN combo_count c
-      ON d.portfolio_id = c.portfolio_id
+      ON e.portfolio_id = c.portfolio_id
+),
+contribution_range AS (
+    SELECT
+        portfolio_id,
+        MAX(contribution_pct) AS highest_contribution_pct,
+        MIN(contribution_pct) AS worst_contribution_pct
+    FROM (
+        SELECT
+            portfolio_id,
+            ROUND(100 * nav_contribution / NULLIF(SUM(nav_contribution) OVER (PARTITION BY portfolio_id),0), 2) AS contribution_pct
+        FROM portfolio_combinations
+    ) p
+    GROUP BY portfolio_id
+),
+rolled_up AS (
+    {rollup}
 )
 SELECT
-    portfolio_id,
-    asset_class,
-    sector,
-    region,
-    theme,
-    nav_contribution,
-    ROUND(100 * nav_contribution / NULLIF(SUM(nav_contribution) OVER (PARTITION BY portfolio_id),0), 2) AS contribution_pct
-FROM portfolio_combinations
-ORDER BY portfolio_id, contribution_pct DESC;
+    r.portfolio_id,
+    r.asset_class,
+    r.sector,
+    r.region,
+    r.theme,
+    r.nav_contribution,
+    ROUND(100 * r.nav_contribution / NULLIF(SUM(r.nav_contribution) OVER (PARTITION BY r.portfolio_id),0), 2) AS contribution_pct,
+    c.highest_contribution_pct,
+    c.worst_contribution_pct
+FROM rolled_up r
+JOIN contribution_range c
+  ON r.portfolio_id = c.portfolio_id
+ORDER BY r.portfolio_id, contribution_pct DESC;
 
         """
         return session.sql(query).to_pandas()
@@ -57,26 +81,22 @@ ORDER BY portfolio_id, contribution_pct DESC;
         return pd.DataFrame()
 
 
-def display_attribution(portfolio_id):
+def display_attribution(portfolio_id, top_k=None):
     """Display attribution analysis and heatmap in Streamlit"""
-    df_attr = get_attribution_data(portfolio_id)
+    df_attr = get_attribution_data(portfolio_id, top_k)
     st.session_state["df_attr"] = df_attr  
 
     st.subheader("🔎 Attribution Analysis")
 
     if not df_attr.empty:
-        # Highest & Worst contribution
-        summary_df = df_attr.groupby("PORTFOLIO_ID").agg(
-            highest_contribution=("CONTRIBUTION_PCT", "max"),
-            worst_contribution=("CONTRIBUTION_PCT", "min")
-        ).reset_index()
+        # Highest & Worst contribution (over unrolled combinations, computed in the warehouse)
         col1, col2 = st.columns(2)
         
-        portfolio_summary = summary_df[summary_df["PORTFOLIO_ID"] == portfolio_id].iloc[0]
+        portfolio_summary = df_attr.iloc[0]
         with col1:
-            st.metric("Highest Contribution", f"{portfolio_summary['highest_contribution']:.2f}%")
+            st.metric("Highest Contribution", f"{portfolio_summary['HIGHEST_CONTRIBUTION_PCT']:.2f}%")
         with col2:
-            st.metric("Worst Contribution", f"{portfolio_summary['worst_contribution']:.2f}%")
+            st.metric("Worst Contribution", f"{portfolio_summary['WORST_CONTRIBUTION_PCT']:.2f}%")
 
         # Heatmap of sector vs region
         st.markdown("### Sector vs Region")
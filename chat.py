@@ -1,8 +1,8 @@
 import streamlit as st
 import pandas as pd
-from snowflake.snowpark.context import get_active_session
+from data_backend import get_session
 
-session = get_active_session()
+session = get_session()
 
 def chatbot_ui(context_keys: list = None, model: str = "mistral-7b"):
     """Streamlit chatbot UI with multiple dataframe contexts"""
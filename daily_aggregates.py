@@ -0,0 +1,372 @@
+# daily_aggregates.py
+import os
+
+import streamlit as st
+from data_backend import get_session, is_local
+
+session = get_session()
+
+# Aggregate tables the panels read from instead of contoso_daily_valuation_fact
+DAILY_AGG_TABLE = "portfolio_daily_agg"
+EXPOSURE_AGG_TABLE = "portfolio_exposure_agg"
+# Scratch tables the materialized refresh builds new rows in
+DAILY_AGG_STAGE_TABLE = "portfolio_daily_agg_stage"
+EXPOSURE_AGG_STAGE_TABLE = "portfolio_exposure_agg_stage"
+# Single-row table updated first in each materialized refresh to serialize them
+REFRESH_LOCK_TABLE = "portfolio_agg_refresh_lock"
+
+# Set with DASHBOARD_AGGREGATE_MODE:
+# "external": the app runs no DDL and reads the tables if a deploy step created
+# them (Snowflake default; see create_aggregate_layer).
+# "dynamic": the app creates Snowflake dynamic tables refreshed incrementally by Snowflake.
+# "materialized": plain tables refreshed by the app from new DATA_DT partitions,
+# for accounts/roles where dynamic tables are not available (local default).
+AGGREGATE_MODE = os.environ.get("DASHBOARD_AGGREGATE_MODE", "materialized" if is_local() else "external")
+TARGET_LAG = "1 hour"
+
+# One row per portfolio per DATA_DT: NAV date, NAV and income
+DAILY_AGG_SELECT = """
+SELECT
+    portfolio_id,
+    data_dt,
+    MAX(nav_dt) AS nav_dt,
+    SUM(net_asset_value_amt) AS nav_amt,
+    SUM(net_investment_income_amt) AS income_amt,
+    COUNT(*) AS valuation_cnt
+FROM contoso_daily_valuation_fact
+WHERE net_asset_value_amt IS NOT NULL
+GROUP BY portfolio_id, data_dt
+"""
+
+# Set by ensure_aggregate_layer; until the aggregate tables are readable the
+# panels run the aggregate queries inline over the fact table
+_aggregate_tables_ready = False
+
+# Daily return over rows of the daily aggregate table. Not stored: it depends
+# on the previous row, so panels compute it over the rows they read.
+DAILY_RETURN_EXPR = "nav_amt / NULLIF(LAG(nav_amt) OVER (PARTITION BY portfolio_id ORDER BY nav_dt), 0) - 1"
+
+# One row per portfolio per asset class/sector/theme/region combination.
+# Income ratios are kept as sum + count so averages stay additive.
+EXPOSURE_AGG_SELECT = """
+SELECT
+    v.portfolio_id,
+    d.investment_type AS asset_class,
+    d.fund_focus AS sector,
+    d.investment_theme AS theme,
+    v.account_region_cd AS region,
+    SUM(v.net_asset_value_amt) AS nav_amt,
+    SUM(v.net_investment_income_amt / NULLIF(v.net_asset_value_amt, 0)) AS income_ratio_sum,
+    COUNT(v.net_investment_income_amt / NULLIF(v.net_asset_value_amt, 0)) AS income_ratio_cnt,
+    MAX(v.data_dt) AS last_data_dt
+FROM contoso_daily_valuation_fact v
+JOIN portfolio_dim_extra d
+ON v.portfolio_id = d.portfolio_id
+GROUP BY v.portfolio_id, d.investment_type, d.fund_focus, d.investment_theme, v.account_region_cd
+"""
+
+
+def create_dynamic_tables(target_lag=TARGET_LAG):
+    """Create the aggregate layer as incrementally refreshed dynamic tables"""
+    warehouse = session.get_current_warehouse()
+    for table, select in [
+        (DAILY_AGG_TABLE, DAILY_AGG_SELECT),
+        (EXPOSURE_AGG_TABLE, EXPOSURE_AGG_SELECT),
+    ]:
+        session.sql(f"""
+        CREATE DYNAMIC TABLE IF NOT EXISTS {table}
+            TARGET_LAG = '{target_lag}'
+            WAREHOUSE = {warehouse}
+            REFRESH_MODE = INCREMENTAL
+        AS {select}
+        """).collect()
+
+
+def create_materialized_tables():
+    """
+    Create empty aggregate tables for the materialized mode, plus the staging
+    tables and lock row the refresh uses (kept outside its transaction, since
+    DDL would commit it)
+    """
+    for table in [DAILY_AGG_TABLE, DAILY_AGG_STAGE_TABLE]:
+        session.sql(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            portfolio_id NUMBER(38,0),
+            data_dt DATE,
+            nav_dt DATE,
+            nav_amt NUMBER(38,2),
+            income_amt NUMBER(38,2),
+            valuation_cnt NUMBER(38,0)
+        )
+        """).collect()
+    for table in [EXPOSURE_AGG_TABLE, EXPOSURE_AGG_STAGE_TABLE]:
+        session.sql(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            portfolio_id NUMBER(38,0),
+            asset_class VARCHAR,
+            sector VARCHAR,
+            theme VARCHAR,
+            region VARCHAR,
+            nav_amt NUMBER(38,2),
+            income_ratio_sum FLOAT,
+            income_ratio_cnt NUMBER(38,0),
+            last_data_dt DATE,
+            tail_dt DATE,
+            tail_nav_amt NUMBER(38,2),
+            tail_income_ratio_sum FLOAT,
+            tail_income_ratio_cnt NUMBER(38,0)
+        )
+        """).collect()
+    session.sql(f"""
+    CREATE TABLE IF NOT EXISTS {REFRESH_LOCK_TABLE} (
+        refreshed_at TIMESTAMP_NTZ
+    )
+    """).collect()
+    session.sql(f"""
+    INSERT INTO {REFRESH_LOCK_TABLE}
+    SELECT CURRENT_TIMESTAMP
+    WHERE NOT EXISTS (SELECT 1 FROM {REFRESH_LOCK_TABLE})
+    """).collect()
+
+
+def refresh_materialized_tables():
+    """
+    Fold new DATA_DT partitions into the aggregate tables. Each table's latest
+    partition is re-aggregated on every refresh, so a day that was only partly
+    loaded last time is completed and repeating a refresh changes nothing.
+    Refreshes run in one transaction behind the lock row, so concurrent app
+    processes apply them one at a time. The SQL is kept portable so the local
+    backend runs the same refresh (see verify_incremental_refresh).
+    """
+    session.sql("BEGIN").collect()
+    try:
+        # Blocks until any other refresh commits; later statements then see its watermark
+        session.sql(f"UPDATE {REFRESH_LOCK_TABLE} SET refreshed_at = CURRENT_TIMESTAMP").collect()
+
+        # Daily rows from the watermark day on replace the stored ones
+        session.sql(f"DELETE FROM {DAILY_AGG_STAGE_TABLE}").collect()
+        session.sql(f"""
+        INSERT INTO {DAILY_AGG_STAGE_TABLE}
+            (portfolio_id, data_dt, nav_dt, nav_amt, income_amt, valuation_cnt)
+        SELECT
+            portfolio_id,
+            data_dt,
+            MAX(nav_dt) AS nav_dt,
+            SUM(net_asset_value_amt) AS nav_amt,
+            SUM(net_investment_income_amt) AS income_amt,
+            COUNT(*) AS valuation_cnt
+        FROM contoso_daily_valuation_fact
+        WHERE net_asset_value_amt IS NOT NULL
+          AND data_dt >= (SELECT COALESCE(MAX(data_dt), '1900-01-01') FROM {DAILY_AGG_TABLE})
+        GROUP BY portfolio_id, data_dt
+        """).collect()
+        session.sql(f"""
+        DELETE FROM {DAILY_AGG_TABLE}
+        WHERE data_dt >= (SELECT MIN(data_dt) FROM {DAILY_AGG_STAGE_TABLE})
+        """).collect()
+        session.sql(f"""
+        INSERT INTO {DAILY_AGG_TABLE}
+            (portfolio_id, data_dt, nav_dt, nav_amt, income_amt, valuation_cnt)
+        SELECT portfolio_id, data_dt, nav_dt, nav_amt, income_amt, valuation_cnt
+        FROM {DAILY_AGG_STAGE_TABLE}
+        """).collect()
+
+        # Exposure totals: stored rows less the watermark day's previous
+        # contribution (the tail_* columns), plus partitions from the watermark
+        # day on. Tail columns come from the new partitions when a combination
+        # has any, so the next refresh takes out the right day.
+        session.sql(f"DELETE FROM {EXPOSURE_AGG_STAGE_TABLE}").collect()
+        session.sql(f"""
+        INSERT INTO {EXPOSURE_AGG_STAGE_TABLE}
+            (portfolio_id, asset_class, sector, theme, region, nav_amt, income_ratio_sum, income_ratio_cnt,
+             last_data_dt, tail_dt, tail_nav_amt, tail_income_ratio_sum, tail_income_ratio_cnt)
+        SELECT
+            portfolio_id,
+            asset_class,
+            sector,
+            theme,
+            region,
+            SUM(nav_amt) AS nav_amt,
+            SUM(income_ratio_sum) AS income_ratio_sum,
+            SUM(income_ratio_cnt) AS income_ratio_cnt,
+            MAX(last_data_dt) AS last_data_dt,
+            MAX(CASE WHEN is_new = max_is_new THEN tail_dt END) AS tail_dt,
+            MAX(CASE WHEN is_new = max_is_new THEN tail_nav_amt END) AS tail_nav_amt,
+            MAX(CASE WHEN is_new = max_is_new THEN tail_income_ratio_sum END) AS tail_income_ratio_sum,
+            MAX(CASE WHEN is_new = max_is_new THEN tail_income_ratio_cnt END) AS tail_income_ratio_cnt
+        FROM (
+            SELECT
+                u.*,
+                MAX(is_new) OVER (PARTITION BY portfolio_id, asset_class, sector, theme, region) AS max_is_new
+            FROM (
+                SELECT
+                    t.portfolio_id,
+                    t.asset_class,
+                    t.sector,
+                    t.theme,
+                    t.region,
+                    t.nav_amt - CASE WHEN t.tail_dt = w.watermark_dt THEN COALESCE(t.tail_nav_amt, 0) ELSE 0 END AS nav_amt,
+                    t.income_ratio_sum - CASE WHEN t.tail_dt = w.watermark_dt THEN COALESCE(t.tail_income_ratio_sum, 0) ELSE 0 END AS income_ratio_sum,
+                    t.income_ratio_cnt - CASE WHEN t.tail_dt = w.watermark_dt THEN t.tail_income_ratio_cnt ELSE 0 END AS income_ratio_cnt,
+                    t.last_data_dt,
+                    t.tail_dt,
+                    t.tail_nav_amt,
+                    t.tail_income_ratio_sum,
+                    t.tail_income_ratio_cnt,
+                    0 AS is_new
+                FROM {EXPOSURE_AGG_TABLE} t
+                CROSS JOIN (
+                    SELECT COALESCE(MAX(tail_dt), '1900-01-01') AS watermark_dt FROM {EXPOSURE_AGG_TABLE}
+                ) w
+                UNION ALL
+                SELECT
+                    v.portfolio_id,
+                    d.investment_type AS asset_class,
+                    d.fund_focus AS sector,
+                    d.investment_theme AS theme,
+                    v.account_region_cd AS region,
+                    SUM(v.net_asset_value_amt) AS nav_amt,
+                    SUM(v.net_investment_income_amt / NULLIF(v.net_asset_value_amt, 0)) AS income_ratio_sum,
+                    COUNT(v.net_investment_income_amt / NULLIF(v.net_asset_value_amt, 0)) AS income_ratio_cnt,
+                    MAX(v.data_dt) AS last_data_dt,
+                    w.tail_dt,
+                    SUM(CASE WHEN v.data_dt = w.tail_dt THEN v.net_asset_value_amt END) AS tail_nav_amt,
+                    SUM(CASE WHEN v.data_dt = w.tail_dt THEN v.net_investment_income_amt / NULLIF(v.net_asset_value_amt, 0) END) AS tail_income_ratio_sum,
+                    COUNT(CASE WHEN v.data_dt = w.tail_dt THEN v.net_investment_income_amt / NULLIF(v.net_asset_value_amt, 0) END) AS tail_income_ratio_cnt,
+                    1 AS is_new
+                FROM contoso_daily_valuation_fact v
+                JOIN portfolio_dim_extra d
+                ON v.portfolio_id = d.portfolio_id
+                CROSS JOIN (
+                    SELECT
+                        (SELECT COALESCE(MAX(tail_dt), '1900-01-01') FROM {EXPOSURE_AGG_TABLE}) AS watermark_dt,
+                        (SELECT MAX(data_dt) FROM contoso_daily_valuation_fact) AS tail_dt
+                ) w
+                WHERE v.data_dt >= w.watermark_dt
+                GROUP BY v.portfolio_id, d.investment_type, d.fund_focus, d.investment_theme, v.account_region_cd,
+                         w.tail_dt
+            ) u
+        ) s
+        GROUP BY portfolio_id, asset_class, sector, theme, region
+        """).collect()
+        session.sql(f"DELETE FROM {EXPOSURE_AGG_TABLE}").collect()
+        session.sql(f"""
+        INSERT INTO {EXPOSURE_AGG_TABLE}
+        SELECT * FROM {EXPOSURE_AGG_STAGE_TABLE}
+        """).collect()
+
+        session.sql("COMMIT").collect()
+    except Exception:
+        session.sql("ROLLBACK").collect()
+        raise
+
+
+def verify_incremental_refresh():
+    """
+    Local backend only: reload the fact table in stages (including a partly
+    loaded day), refresh twice after each, and compare the materialized tables
+    with a full rebuild from DAILY_AGG_SELECT / EXPOSURE_AGG_SELECT.
+    Returns {table: number of mismatched rows}.
+    """
+    if not is_local():
+        raise RuntimeError("verify_incremental_refresh reloads the fact table; run it on the local backend")
+
+    create_materialized_tables()
+    for table in [DAILY_AGG_TABLE, EXPOSURE_AGG_TABLE]:
+        session.sql(f"DELETE FROM {table}").collect()
+    session.sql("""
+    CREATE TEMP TABLE fact_full AS
+    SELECT * FROM contoso_daily_valuation_fact ORDER BY data_dt
+    """).collect()
+    session.sql("DELETE FROM contoso_daily_valuation_fact").collect()
+
+    n = session.sql("SELECT COUNT(*) AS n FROM fact_full").to_pandas()["N"].iloc[0]
+    cuts = [0, n // 2, n // 2 + 1, n - 5, n]
+    for lo, hi in zip(cuts, cuts[1:]):
+        session.sql(f"""
+        INSERT INTO contoso_daily_valuation_fact
+        SELECT * FROM fact_full WHERE rowid > {lo} AND rowid <= {hi}
+        """).collect()
+        refresh_materialized_tables()
+        refresh_materialized_tables()
+    session.sql("DROP TABLE fact_full").collect()
+
+    mismatches = {}
+    for table, select, columns in [
+        (DAILY_AGG_TABLE, DAILY_AGG_SELECT,
+         "portfolio_id, data_dt, nav_dt, ROUND(nav_amt, 2), ROUND(income_amt, 2), valuation_cnt"),
+        (EXPOSURE_AGG_TABLE, EXPOSURE_AGG_SELECT,
+         "portfolio_id, asset_class, sector, theme, region, ROUND(nav_amt, 2), "
+         "ROUND(income_ratio_sum, 6), income_ratio_cnt, last_data_dt"),
+    ]:
+        full = f"SELECT {columns} FROM ({select}) f"
+        incremental = f"SELECT {columns} FROM {table}"
+        # EXCEPT ignores duplicates, so row counts are compared as well
+        mismatches[table] = session.sql(f"""
+        SELECT
+            (SELECT COUNT(*) FROM ({full} EXCEPT {incremental}) m)
+            + (SELECT COUNT(*) FROM ({incremental} EXCEPT {full}) m)
+            + ABS((SELECT COUNT(*) FROM ({select}) f) - (SELECT COUNT(*) FROM {table})) AS n
+        """).to_pandas()["N"].iloc[0]
+    return mismatches
+
+
+def create_aggregate_layer(mode=AGGREGATE_MODE):
+    """
+    Create the aggregate tables for `mode` (and in materialized mode pull in
+    new partitions). Needs CREATE privileges: run it as a deploy step, e.g.
+    create_aggregate_layer("dynamic") from a Snowflake notebook.
+    """
+    if mode == "dynamic":
+        create_dynamic_tables()
+    elif mode == "materialized":
+        create_materialized_tables()
+        refresh_materialized_tables()
+    elif mode != "external":
+        raise ValueError(f"Unknown aggregate mode: {mode}")
+
+
+def _aggregate_tables_exist():
+    for table in [DAILY_AGG_TABLE, EXPOSURE_AGG_TABLE]:
+        try:
+            session.sql(f"SELECT 1 FROM {table} LIMIT 1").collect()
+        except Exception:
+            return False
+    return True
+
+
+@st.cache_resource(ttl=3600)
+def _prepare_aggregate_layer():
+    """Prepare the aggregate layer for AGGREGATE_MODE; returns whether its tables can be read"""
+    create_aggregate_layer()
+    return _aggregate_tables_exist()
+
+
+def ensure_aggregate_layer():
+    """
+    Prepare the aggregate layer once per hour; failures are not cached and retry
+    on the next run. Panels read from the fact table while the tables are unavailable.
+    """
+    global _aggregate_tables_ready
+    try:
+        _aggregate_tables_ready = _prepare_aggregate_layer()
+    except Exception as e:
+        _aggregate_tables_ready = False
+        st.warning(f"Aggregate tables unavailable, reading from the fact table: {str(e)}")
+
+
+def daily_agg_source():
+    """Daily aggregate table, or its query over the fact table when the table is unavailable"""
+    return DAILY_AGG_TABLE if _aggregate_tables_ready else f"({DAILY_AGG_SELECT})"
+
+
+def exposure_agg_source():
+    """Exposure aggregate table, or its query over the fact table when the table is unavailable"""
+    return EXPOSURE_AGG_TABLE if _aggregate_tables_ready else f"({EXPOSURE_AGG_SELECT})"
+
+
+if __name__ == "__main__":
+    mismatches = verify_incremental_refresh()
+    for table, n in mismatches.items():
+        print(f"{table}: {n} rows differ from a full rebuild")
+    raise SystemExit(1 if any(mismatches.values()) else 0)
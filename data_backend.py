@@ -0,0 +1,115 @@
+# data_backend.py
+import os
+import sqlite3
+import threading
+import zipfile
+from functools import lru_cache
+
+import pandas as pd
+
+# "snowflake" (default) uses the active Snowpark session; "local" serves the
+# same SQL from an in-memory SQLite copy of the sample data in Input Files.zip
+BACKEND = os.environ.get("DASHBOARD_BACKEND", "snowflake")
+LOCAL_DATA_ARCHIVE = os.environ.get(
+    "DASHBOARD_LOCAL_DATA",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "Input Files.zip"),
+)
+LOCAL_TABLES = [
+    "contoso_daily_valuation_fact",
+    "portfolio_dim",
+    "portfolio_dim_extra",
+    "benchmark_timeseries",
+]
+LOCAL_CORTEX_RESPONSE = "Cortex is not available on the local backend."
+
+
+def get_session():
+    """Return the session all panel modules run their SQL against"""
+    if BACKEND == "local":
+        return get_local_session()
+    from snowflake.snowpark.context import get_active_session
+    return get_active_session()
+
+
+def is_local():
+    return BACKEND == "local"
+
+
+@lru_cache(maxsize=None)
+def get_local_session():
+    return LocalSession(LOCAL_DATA_ARCHIVE)
+
+
+class _StddevWindow:
+    """Sample standard deviation usable as an aggregate or window function in SQLite"""
+
+    def __init__(self):
+        self.values = []
+
+    def step(self, value):
+        if value is not None:
+            self.values.append(value)
+
+    def inverse(self, value):
+        if value is not None:
+            self.values.remove(value)
+
+    def value(self):
+        n = len(self.values)
+        if n < 2:
+            return None
+        mean = sum(self.values) / n
+        return (sum((v - mean) ** 2 for v in self.values) / (n - 1)) ** 0.5
+
+    def finalize(self):
+        return self.value()
+
+
+class LocalDataFrame:
+    """Minimal stand-in for a Snowpark DataFrame returned by LocalSession.sql"""
+
+    def __init__(self, session, query):
+        self._session = session
+        self._query = query
+
+    def to_pandas(self):
+        return self._session._execute(self._query)
+
+    def collect(self):
+        return self.to_pandas().to_dict("records")
+
+
+class LocalSession:
+    """
+    SQLite-backed session exposing the subset of the Snowpark Session API the
+    dashboard uses (`sql(...).to_pandas()` / `.collect()`).
+    Executed queries are counted in `query_count`.
+    """
+
+    def __init__(self, archive):
+        # Autocommit, so explicit BEGIN/COMMIT behave as they do on Snowflake
+        self._conn = sqlite3.connect(":memory:", check_same_thread=False, isolation_level=None)
+        self._conn.create_window_function("STDDEV", 1, _StddevWindow)
+        self._lock = threading.Lock()
+        self.query_count = 0
+
+        with zipfile.ZipFile(archive) as zf:
+            for table in LOCAL_TABLES:
+                with zf.open(f"Input Files/{table}.csv") as f:
+                    pd.read_csv(f).to_sql(table, self._conn, index=False)
+
+    def sql(self, query):
+        with self._lock:
+            self.query_count += 1
+        return LocalDataFrame(self, query)
+
+    def get_current_warehouse(self):
+        return None
+
+    def _execute(self, query):
+        if "SNOWFLAKE.CORTEX.COMPLETE" in query.upper():
+            return pd.DataFrame({"RESPONSE": [LOCAL_CORTEX_RESPONSE]})
+        with self._lock:
+            cursor = self._conn.execute(query.strip().rstrip(";"))
+            columns = [c[0].upper() for c in cursor.description or []]
+            return pd.DataFrame(cursor.fetchall(), columns=columns)
@@ -0,0 +1,263 @@
+# load_test.py
+"""
+Concurrent-session load test for the dashboard.
+
+Drives many headless sessions of streamlit_app.py with Streamlit's AppTest
+against the local data backend, replaying a realistic interaction script per
+session (change portfolio, scrub dates, toggle the allocation drill-down,
+send a chat message). Reports p50/p95/p99 page latency, throughput, cache hit
+rate and process memory for each concurrency level. Memory is current and
+peak RSS with psutil installed; without it only peak_rss_mb is reported (the
+process's peak so far, from ru_maxrss).
+
+    python load_test.py --concurrency 1 5 10 25 --sessions-per-worker 2
+"""
+import os
+
+os.environ.setdefault("DASHBOARD_BACKEND", "local")
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import argparse
+import functools
+import json
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import data_backend
+import nav_data
+import risk_metrics
+import attribution
+import allocation_exposure
+import thematic_exposure
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit_app.py")
+
+# Cached fetch functions whose hit rate is reported
+CACHED_FETCHES = [
+    (nav_data, "get_nav_data"),
+    (risk_metrics, "get_risk_metrics"),
+    (attribution, "get_attribution_data"),
+    (allocation_exposure, "get_allocation_data"),
+    (thematic_exposure, "get_thematic_data"),
+]
+
+CHAT_PROMPTS = [
+    "How did this portfolio perform against its benchmark?",
+    "Which sector contributes the most?",
+    "Is the current drawdown a concern?",
+    "What is the largest theme exposure?",
+]
+
+_fetch_calls = Counter()
+_fetch_misses = Counter()
+_fetch_counts_lock = threading.Lock()
+
+
+def _counting(func, counter, name):
+    @functools.wraps(func)
+    def counted(*args, **kwargs):
+        with _fetch_counts_lock:
+            counter[name] += 1
+        return func(*args, **kwargs)
+    return counted
+
+
+def _count_fetch_calls():
+    """
+    Re-cache each fetch around its undecorated function so cache misses are
+    counted where they happen, and count every call (hit or miss) outside it
+    """
+    for module, name in CACHED_FETCHES:
+        func = getattr(module, name).__wrapped__
+        cached = st.cache_data(_counting(func, _fetch_misses, name))
+        setattr(module, name, _counting(cached, _fetch_calls, name))
+
+
+def _rss_mb():
+    """Current RSS, or the process's peak RSS so far when psutil is missing"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 2**20
+    import resource
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+
+
+class _MemorySampler(threading.Thread):
+    """Samples process RSS in the background and keeps the peak"""
+
+    def __init__(self, interval=0.1):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_mb = _rss_mb()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, _rss_mb())
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _widget(elements, label):
+    return next((w for w in elements if w.label == label), None)
+
+
+def run_session(seed, portfolio_ids, timeout):
+    """
+    Replay one user's interaction script.
+    Returns a list of (action, latency_s), the number of script exceptions and
+    the number of st.error messages (fetch failures are reported that way).
+    """
+    rng = random.Random(seed)
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    timings, exceptions, st_errors = [], 0, 0
+
+    def timed(action):
+        nonlocal exceptions, st_errors
+        start = time.perf_counter()
+        at.run()
+        timings.append((action, time.perf_counter() - start))
+        exceptions += len(at.exception)
+        st_errors += len(at.error)
+
+    timed("load")
+
+    # Change portfolio
+    _widget(at.sidebar.number_input, "Enter Portfolio ID").set_value(rng.choice(portfolio_ids))
+    timed("change_portfolio")
+
+    # Scrub the start date forward a few months
+    start_date = _widget(at.sidebar.date_input, "Start Date")
+    scrub_from = date(2023, 1, 1)
+    for step in range(1, 4):
+        start_date.set_value(scrub_from + timedelta(days=30 * step + rng.randint(0, 10)))
+        timed("scrub_dates")
+
+    # Toggle the allocation drill-down there and back
+    for option in ["Region", "Sector"]:
+        drill = _widget(at.selectbox, "Drill-down by:")
+        if drill is None:
+            break
+        drill.set_value(option)
+        timed("toggle_drilldown")
+
+    # Send a chat message
+    if at.chat_input:
+        at.chat_input[0].set_value(rng.choice(CHAT_PROMPTS))
+        timed("chat")
+
+    return timings, exceptions, st_errors
+
+
+def run_level(concurrency, sessions_per_worker, portfolio_ids, timeout, seed):
+    """Run `concurrency` sessions at a time from a cold cache and summarise"""
+    session = data_backend.get_local_session()
+    st.cache_data.clear()
+    session.query_count = 0
+    _fetch_calls.clear()
+    _fetch_misses.clear()
+
+    sampler = _MemorySampler()
+    sampler.start()
+    seeds = [seed + i for i in range(concurrency * sessions_per_worker)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda s: run_session(s, portfolio_ids, timeout), seeds))
+    wall = time.perf_counter() - start
+    sampler.stop()
+
+    timings = pd.DataFrame(
+        [t for session_timings, _, _ in results for t in session_timings],
+        columns=["action", "latency_s"],
+    )
+    latencies_ms = timings["latency_s"].to_numpy() * 1000
+    calls = sum(_fetch_calls.values())
+    misses = sum(_fetch_misses.values())
+
+    summary = {
+        "concurrency": concurrency,
+        "sessions": len(seeds),
+        "pages": len(timings),
+        "exceptions": sum(exceptions for _, exceptions, _ in results),
+        "st_errors": sum(st_errors for _, _, st_errors in results),
+        "p50_ms": np.percentile(latencies_ms, 50),
+        "p95_ms": np.percentile(latencies_ms, 95),
+        "p99_ms": np.percentile(latencies_ms, 99),
+        "pages_per_s": len(timings) / wall,
+        "cache_hit_pct": 100 * (1 - misses / calls) if calls else float("nan"),
+        "queries": session.query_count,
+        "peak_rss_mb": sampler.peak_mb,
+    }
+    if psutil is not None:
+        summary["rss_mb"] = _rss_mb()
+    by_action = (
+        timings.assign(latency_ms=timings["latency_s"] * 1000)
+        .groupby("action")["latency_ms"]
+        .describe(percentiles=[0.5, 0.95])
+        .assign(concurrency=concurrency)
+    )
+    return summary, by_action
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-user load test for the dashboard")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 5, 10, 25],
+                        help="Concurrent sessions per level")
+    parser.add_argument("--sessions-per-worker", type=int, default=1,
+                        help="Sessions each concurrent worker replays per level")
+    parser.add_argument("--timeout", type=float, default=120,
+                        help="Per-page AppTest timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the summary to this file")
+    args = parser.parse_args()
+
+    if not data_backend.is_local():
+        parser.error("load_test.py runs against the local backend (DASHBOARD_BACKEND=local)")
+
+    _count_fetch_calls()
+    portfolio_ids = (
+        data_backend.get_local_session()
+        .sql("SELECT DISTINCT portfolio_id FROM portfolio_dim_extra")
+        .to_pandas()["PORTFOLIO_ID"]
+        .tolist()
+    )
+
+    summaries, breakdowns = [], []
+    for concurrency in args.concurrency:
+        summary, by_action = run_level(
+            concurrency, args.sessions_per_worker, portfolio_ids, args.timeout, args.seed
+        )
+        summaries.append(summary)
+        breakdowns.append(by_action)
+        print(f"concurrency={concurrency}: p95={summary['p95_ms']:.0f} ms, "
+              f"{summary['pages_per_s']:.2f} pages/s", flush=True)
+
+    pd.set_option("display.width", 200)
+    print("\nSummary")
+    print(pd.DataFrame(summaries).round(1).to_string(index=False))
+    print("\nLatency by action (ms)")
+    print(pd.concat(breakdowns).round(1).to_string())
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summaries, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
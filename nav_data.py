@@ -1,20 +1,27 @@
 import streamlit as st
 import pandas as pd
-from snowflake.snowpark.context import get_active_session
+from data_backend import get_session
+from daily_aggregates import daily_agg_source, DAILY_RETURN_EXPR
 
-session = get_active_session()
+session = get_session()
 
 @st.cache_data
 def get_nav_data(portfolio_id, start_dt, end_dt):
-    """Fetch NAV values"""
+    """Fetch daily NAV values and returns from the daily aggregate table"""
     try:
         query = f"""
-        SELECT v.portfolio_id, v.data_dt as nav_dt, v.net_asset_value_amt
-        FROM contoso_daily_valuation_fact v
-        WHERE v.portfolio_id = {portfolio_id}
-          AND v.data_dt BETWEEN '{start_dt}' AND '{end_dt}'
-          AND v.net_asset_value_amt IS NOT NULL
-        ORDER BY v.data_dt;
+        SELECT
+            a.portfolio_id,
+            a.data_dt as nav_dt,
+            a.nav_amt AS net_asset_value_amt,
+            a.daily_return * 100 AS daily_return_pct
+        FROM (
+            SELECT *, {DAILY_RETURN_EXPR} AS daily_return
+            FROM {daily_agg_source()} d
+            WHERE portfolio_id = {portfolio_id}
+        ) a
+        WHERE a.data_dt BETWEEN '{start_dt}' AND '{end_dt}'
+        ORDER BY a.data_dt;
         """
         return session.sql(query).to_pandas()
     except Exception as e:
@@ -2,9 +2,10 @@ import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from snowflake.snowpark.context import get_active_session
+from data_backend import get_session
+from daily_aggregates import daily_agg_source
 
-session = get_active_session()
+session = get_session()
 
 def get_portfolio_benchmark_data(portfolio_id, start_dt, end_dt):
     """Fetch portfolio vs benchmark comparison data"""
@@ -14,12 +15,12 @@ def get_portfolio_benchmark_data(portfolio_id, start_dt, end_dt):
             v.data_dt AS Date,
             v.portfolio_id,
             d.benchmark_desc AS Benchmark,
-            100 * v.net_asset_value_amt / FIRST_VALUE(v.net_asset_value_amt) 
+            100 * v.nav_amt / FIRST_VALUE(v.nav_amt) 
                 OVER (PARTITION BY v.portfolio_id ORDER BY v.data_dt) AS Portfolio_NAV_Index,
             100 * b.benchmarknav / FIRST_VALUE(b.benchmarknav) 
                 OVER (PARTITION BY v.portfolio_id ORDER BY v.data_dt) AS Benchmark_Index
         FROM
-            contoso_daily_valuation_fact v
+            {daily_agg_source()} v
         INNER JOIN
             portfolio_dim d ON v.portfolio_id = d.portfolio_id
         INNER JOIN
@@ -29,7 +30,6 @@ def get_portfolio_benchmark_data(portfolio_id, start_dt, end_dt):
         WHERE
            v.portfolio_id = {portfolio_id}
            AND v.data_dt BETWEEN '{start_dt}' AND '{end_dt}'
-           AND v.net_asset_value_amt IS NOT NULL
            AND b.benchmarknav IS NOT NULL
         ORDER BY v.data_dt;
         """
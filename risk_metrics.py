@@ -1,28 +1,22 @@
 import streamlit as st
 import pandas as pd
 import altair as alt
-from snowflake.snowpark.context import get_active_session
+from data_backend import get_session
+from daily_aggregates import daily_agg_source, DAILY_RETURN_EXPR
 
-session = get_active_session()
+session = get_session()
 
 @st.cache_data
 def get_risk_metrics(portfolio_id):
     query = f"""
     WITH nav_with_returns AS (
         SELECT
-            v.portfolio_id,
-            v.nav_dt,
-            v.net_asset_value_amt,
-            LAG(v.net_asset_value_amt) OVER (
-                PARTITION BY v.portfolio_id 
-                ORDER BY v.nav_dt
-            ) AS prev_nav,
-            (v.net_asset_value_amt / NULLIF(LAG(v.net_asset_value_amt) OVER (
-                PARTITION BY v.portfolio_id 
-                ORDER BY v.nav_dt
-            ), 0) - 1) AS daily_return
-        FROM contoso_daily_valuation_fact v
-        WHERE v.portfolio_id = {portfolio_id}
+            a.portfolio_id,
+            a.nav_dt,
+            a.nav_amt AS net_asset_value_amt,
+            {DAILY_RETURN_EXPR} AS daily_return
+        FROM {daily_agg_source()} a
+        WHERE a.portfolio_id = {portfolio_id}
     ),
     risk_data AS (
         SELECT
@@ -0,0 +1,54 @@
+# rollup.py
+
+OTHER_BUCKET = "Other"
+
+# Default number of values kept per dimension before rolling up into "Other"
+DEFAULT_TOP_K = {"sector": 10, "region": 10, "theme": 10}
+
+
+def top_k_rollup_sql(source, dimensions, measure, top_k=None, partition_by=None):
+    """
+    Build a SELECT over `source` that keeps the top K values of each dimension
+    (ranked by total `measure`) and folds everything else into an "Other" bucket.
+
+    `top_k` maps a dimension name to its K; dimensions that are missing or set
+    to None/0 are returned as-is. Ranking is done within `partition_by`
+    (e.g. per portfolio) when given. Returns one row per partition and
+    bucketed dimension combination with the summed `measure`.
+    """
+    top_k = {dim: int(k) for dim, k in (top_k or {}).items() if dim in dimensions and k}
+    partition = [partition_by] if partition_by else []
+
+    totals, ranks, buckets = [], [], []
+    for dim in dimensions:
+        k = top_k.get(dim)
+        if k is None:
+            buckets.append(dim)
+            continue
+        if k < 1:
+            raise ValueError(f"Top-K for '{dim}' must be a positive integer, got {k}")
+        totals.append(
+            f"SUM({measure}) OVER (PARTITION BY {', '.join(partition + [dim])}) AS {dim}_total"
+        )
+        partition_clause = f"PARTITION BY {partition_by} " if partition_by else ""
+        ranks.append(
+            f"DENSE_RANK() OVER ({partition_clause}ORDER BY {dim}_total DESC, {dim}) AS {dim}_rank"
+        )
+        buckets.append(
+            f"CASE WHEN {dim}_rank <= {k} THEN {dim} ELSE '{OTHER_BUCKET}' END AS {dim}"
+        )
+
+    ranked = source
+    if totals:
+        ranked = f"""(
+            SELECT *, {', '.join(ranks)}
+            FROM (SELECT *, {', '.join(totals)} FROM {source}) t
+        ) r"""
+
+    select_list = partition + buckets
+    group_by = ", ".join(str(i) for i in range(1, len(select_list) + 1))
+    return f"""
+        SELECT {', '.join(select_list)}, SUM({measure}) AS {measure}
+        FROM {ranked}
+        GROUP BY {group_by}
+    """
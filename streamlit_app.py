@@ -4,6 +4,7 @@ import streamlit as st
 from datetime import date
 
 # Import all modules
+import daily_aggregates
 import nav_data
 import portfolio_benchmark
 import risk_metrics
@@ -11,6 +12,7 @@ import attribution
 import allocation_exposure
 import thematic_exposure
 import chat
+from rollup import DEFAULT_TOP_K
 
 
 # ---------------------------------------------------------
@@ -23,6 +25,9 @@ st.set_page_config(
 
 st.title("📈 Portfolio Analytics Dashboard")
 
+# Panels read from the precomputed per-portfolio aggregate tables
+daily_aggregates.ensure_aggregate_layer()
+
 
 # ---------------------------------------------------------
 # SIDEBAR INPUTS
@@ -49,6 +54,15 @@ end_date = st.sidebar.date_input(
 start_dt = start_date.strftime("%Y-%m-%d")
 end_dt = end_date.strftime("%Y-%m-%d")
 
+st.sidebar.header("Display Options")
+st.sidebar.caption("Show the top K values per dimension and roll the rest into \"Other\" (0 = show all).")
+
+top_k = {
+    "sector": st.sidebar.number_input("Top Sectors", min_value=0, value=DEFAULT_TOP_K["sector"], step=1),
+    "region": st.sidebar.number_input("Top Regions", min_value=0, value=DEFAULT_TOP_K["region"], step=1),
+    "theme": st.sidebar.number_input("Top Themes", min_value=0, value=DEFAULT_TOP_K["theme"], step=1),
+}
+
 
 # ---------------------------------------------------------
 # 1️⃣ NAV Trend
@@ -75,13 +89,13 @@ df_risk = risk_metrics.render_risk_metrics(portfolio_id)
 # ---------------------------------------------------------
 # 4️⃣ Attribution Analysis
 # ---------------------------------------------------------
-df_attr = attribution.display_attribution(portfolio_id)
+df_attr = attribution.display_attribution(portfolio_id, top_k)
 
 
 # ---------------------------------------------------------
 # 5️⃣ Allocation & Exposure
 # ---------------------------------------------------------
-df_allocation = allocation_exposure.display_allocation(portfolio_id)
+df_allocation = allocation_exposure.display_allocation(portfolio_id, top_k)
 
 
 # ---------------------------------------------------------
@@ -2,9 +2,10 @@ import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from snowflake.snowpark.context import get_active_session
+from data_backend import get_session
+from daily_aggregates import exposure_agg_source
 
-session = get_active_session()
+session = get_session()
 
 @st.cache_data
 def get_thematic_data(portfolio_id):
@@ -15,13 +16,11 @@ def get_thematic_data(portfolio_id):
     try:
         query = f"""
         SELECT
-            d.investment_theme AS theme,
-            SUM(v.net_asset_value_amt) AS nav_amt,
-            AVG(v.net_investment_income_amt / NULLIF(v.net_asset_value_amt,0)) * 100 AS return_pct
-        FROM contoso_daily_valuation_fact v
-        JOIN portfolio_dim_extra d
-        ON v.portfolio_id = d.portfolio_id
-        GROUP BY theme
+            e.theme,
+            SUM(e.nav_amt) AS nav_amt,
+            SUM(e.income_ratio_sum) / NULLIF(SUM(e.income_ratio_cnt), 0) * 100 AS return_pct
+        FROM {exposure_agg_source()} e
+        GROUP BY e.theme
         """
         return session.sql(query).to_pandas()
     except Exception as e: